@@ -8,9 +8,27 @@ Program to convert floating-point values between different representations
 
 import argparse
 import bigfloat
+import io
 import math
+import multiprocessing
+import os
 import re
 import sys
+import threading
+import time
+
+try:
+    import numpy
+except ImportError:
+    # Only needed for the vectorized functions that operate on whole arrays of
+    # bit patterns; everything else works without it.
+    numpy = None
+
+try:
+    # Python 2's input() evals whatever you type.
+    input = raw_input
+except NameError:
+    pass
 
 # bigfloat docs:
 #     https://bigfloat.readthedocs.io/en/latest/reference/index.html
@@ -81,84 +99,501 @@ def main():
 
     args = parseArgs()
 
+    if args.repl:
+        showRepl(args)
+        return
+
+    if args.ulp_diff:
+        showUlpDiff(args)
+        return
+
+    if args.diff_files:
+        showFileDiff(args)
+        return
+
+    if args.scan:
+        showScan(args)
+        return
+
+    if args.all_formats:
+        for i, inp in enumerate(args.inputs):
+            try:
+                wide, exact, inputType = parseValueToOdd(inp,
+                    ALL_FORMATS_PRECISION)
+            except ValueError:
+                print("Error: failed to parse value {!r}".format(inp))
+                sys.exit(1)
+            if i > 0:
+                print("")
+            print("### INPUT {}: {}".format(inputType, inp))
+            showAllFormats(wide, exact, exactDecimal=args.exact,
+                maxDigits=args.max_digits)
+        return
+
     first = True
     for inp in args.inputs:
-        context = mkContext(args.format)
-        # TODO this context should maybe be applied by some callees? Or just
-        # have a top-level "process one arg" function which applies it and then
-        # everyone else assumes that's the context on entry.
-        with context:
-            inputType = "???"
-            if args.input_is_bits:
-                try:
-                    bits = int(inp, 0)
-                    if bits < 0:
-                        raise ValueError
-                except ValueError:
-                    # Either < 0 or failed to parse
-                    print("Error: illegal bits {!r}, must be nonnegative "
-                            "integer".format(inp))
-                    # Could try something like the following, but then we might
-                    # want to also check for "-", and "e" and "p" (for
-                    # exponents), and really at that point we should just be
-                    # checking if it parses as a float. Which wouldn't be that
-                    # bad, but seems overkill.
-                    #if "." in inp:
-                    #    printf("Did you mean to specify --value?")
-                    sys.exit(1)
-                # Warn if the bits input looks like decimal. Don't warn if it
-                # looks like a single-digit constant (which would be the same
-                # in hex anyway, minus prefix) or an octal constant (which is
-                # honestly kind of an odd choice as well, but I guess it's
-                # power-of-2 based at least).
-                if inp.isdigit() and not inp.startswith("0") and bits >= 10:
-                    print("Warning: bits {!r} appear to be decimal; recommend "
-                            "hex instead.")
-                if bits >= (1 << args.format.totalBits):
-                    print("Error: bits {inp!r} too large, {gotWidth} bits "
-                            "long but {fmt} format only has {maxWidth} bits"
-                            .format(
-                                inp      = inp,
-                                # Length of binary repr minus "0b"
-                                gotWidth = len(bin(bits)) - 2,
-                                fmt      = args.format,
-                                maxWidth = args.format.totalBits))
-                    sys.exit(1)
-                fltVal = FloatValue.fromBits(bits, args.format)
-                inputType = "BITS"
-            else:
-                try:
-                    # Note: it's ("0x" in inp) not (inp.startswith("0x"))
-                    # because there could be a negative sign in front. Nothing
-                    # with a "0x" in it can be valid decimal, and fromhex is
-                    # already going to check validity, so it doesn't matter
-                    # that we're being overly forgiving with this check.
-                    if "0x" in inp or "0X" in inp:
-                        value = bigfloat.BigFloat.fromhex(inp, context=context)
-                        inputType = "HEX"
-                    else:
-                        value = bigfloat.BigFloat(inp, context=context)
-                        # bigfloat doesn't preserve the sign bit of "-nan",
-                        # even though it is able to represent a NaN with the
-                        # sign bit set.
-                        if bigfloat.is_nan(value) and NEG_NAN_RE.match(inp):
-                            value = bigfloat.copysign(value, -1)
-                        inputType = "DECIMAL"
-                    fltVal = FloatValue.fromValue(value, args.format)
-                except ValueError:
-                    print("Error: failed to parse value {!r}".format(inp))
-                    sys.exit(1)
-                # TODO:
-                #   - Error if the parse succeeded but it's out of range
-                #   - Warn if hex input and it's not exact
-                #       - ...actually maybe note this in decimal as well? Could
-                #         be a "note" in decimal and a "warning" in hex.
-            if not first:
+        fltVal, inputType = parseInput(inp, args, mkContext(args.format))
+        if not first:
+            print("")
+        first = False
+        print("### INPUT {}: {}".format(inputType, inp))
+        showFloat(fltVal, exactDecimal=args.exact, maxDigits=args.max_digits)
+
+
+def showUlpDiff(args):
+    """
+    Show both inputs, followed by the signed distance in ULPs from the first
+    to the second.
+    """
+    fltVals = []
+    for inp in args.inputs:
+        fltVal, inputType = parseInput(inp, args, mkContext(args.format))
+        if fltVals:
+            print("")
+        print("### INPUT {}: {}".format(inputType, inp))
+        showFloat(fltVal, exactDecimal=args.exact, maxDigits=args.max_digits)
+        fltVals.append(fltVal)
+
+    a, b = fltVals
+    print("")
+    print("### ULP DIFF: {} -> {}".format(*args.inputs))
+    if bigfloat.is_nan(a.value) or bigfloat.is_nan(b.value):
+        print("ULPs (B - A): n/a (NaN)")
+    else:
+        print("ULPs (B - A): {:d}".format(b.ulpOrdinal - a.ulpOrdinal))
+
+
+def showFileDiff(args):
+    """
+    Compare two raw dumps of floats element by element, and show summary
+    statistics followed by a full report of the worst mismatches.
+    """
+    golden, candidate = args.inputs
+    if numpy is None:
+        print("Error: --diff-files requires numpy")
+        sys.exit(1)
+    try:
+        diff = diffBitsFiles(golden, candidate, args.format,
+            numWorst=args.worst)
+    except (IOError, OSError, ValueError) as e:
+        print("Error: {}".format(e))
+        sys.exit(1)
+
+    print("### DIFF FILES ({}): {} -> {}".format(args.format, golden,
+        candidate))
+    print("Elements:       {:d}".format(diff.numElems))
+    print("Exact matches:  {:d}".format(diff.numExact))
+    print("NaN mismatches: {:d}".format(diff.numNanMismatches))
+    print("Inf mismatches: {:d}".format(diff.numInfMismatches))
+    if diff.numCompared > 0:
+        print("Max ULP error:  {:d} (at index {:d})".format(diff.maxUlps,
+            diff.maxIndex))
+        print("Mean ULP error: {:.6g}".format(diff.sumUlps /
+            diff.numCompared))
+
+    for rank, (ulps, index, goldenBits, candidateBits) in \
+            enumerate(diff.worst):
+        fltVals = (FloatValue.fromBits(goldenBits, args.format),
+                   FloatValue.fromBits(candidateBits, args.format))
+        if ulps is not None:
+            error = "{:d} ULPs".format(ulps)
+        elif any(bigfloat.is_nan(fltVal.value) for fltVal in fltVals):
+            error = "NaN mismatch"
+        else:
+            error = "Inf mismatch"
+        for name, fltVal in zip(("GOLDEN", "CANDIDATE"), fltVals):
+            print("")
+            print("### WORST {:d} OF {:d}, INDEX {:d}, {} ({})".format(
+                rank + 1, len(diff.worst), index, name, error))
+            showFloat(fltVal, exactDecimal=args.exact,
+                maxDigits=args.max_digits)
+
+
+def showScan(args):
+    """
+    Scan files for float literals and list every occurrence of a literal that
+    isn't exactly representable in args.format.
+    """
+    paths = findScanFiles(args.inputs)
+    occurrences = []
+    numRead = 0
+    for path, literals, error in scanFiles(paths, args.jobs):
+        if error is not None:
+            print("Warning: can't read {!r}: {}".format(path, error))
+            continue
+        numRead += 1
+        occurrences.extend((path, lineno, literal)
+                           for lineno, literal in literals)
+
+    # Many literals (0.5, 1e-6, ...) show up over and over, so only evaluate
+    # each distinct one once.
+    results = {}
+    for literal in set(literal for _, _, literal in occurrences):
+        results[literal] = checkLiteral(literal, args.format)
+
+    inexact = [(path, lineno, literal)
+               for path, lineno, literal in occurrences
+               if results[literal] is not None]
+    print("### SCAN ({}): {:d} files, {:d} literals ({:d} unique), {:d} "
+          "inexact".format(args.format, numRead, len(occurrences),
+              len(results), len(inexact)))
+    for path, lineno, literal in inexact:
+        fltVal, err = results[literal]
+        print("{}:{:d}: {} -> {} ({}), round err {}".format(path, lineno,
+            literal, formatDecimal(fltVal, args.exact, args.max_digits),
+            formatHex(fltVal), err))
+
+
+def showRepl(args):
+    """
+    Read lines from stdin until EOF or :quit, showing each value entered and
+    running each command. Startup (argument parsing, self-tests, importing
+    bigfloat) happens once, so each query only pays for the conversion itself.
+    """
+    interactive = sys.stdin.isatty()
+    historyPath = None
+    if interactive:
+        historyPath = loadReplHistory()
+        print("Type :help for commands, :quit or Ctrl-D to exit.")
+    prompt = "showfloat> " if interactive else ""
+    session = ReplSession(args, interactive)
+    try:
+        while True:
+            try:
+                line = input(prompt)
+            except EOFError:
+                if interactive:
+                    print("")
+                break
+            except KeyboardInterrupt:
+                # Just abandon the current line, like a shell would.
                 print("")
-            first = False
-            print("### INPUT {}: {}".format(inputType, inp))
-            showFloat(fltVal, exactDecimal=args.exact)
+                continue
+            try:
+                keepGoing = session.handleLine(line)
+            except KeyboardInterrupt:
+                # Give up on this value (e.g. a huge --exact expansion),
+                # finishing off whatever line it was partway through.
+                print("")
+                continue
+            if not keepGoing:
+                break
+    finally:
+        if historyPath is not None:
+            saveReplHistory(historyPath)
+
 
+REPL_HISTORY_FILE = "~/.showfloat_history"
+REPL_HISTORY_LENGTH = 1000
+
+def loadReplHistory():
+    """
+    Set up readline (if available) for line editing and history, and load the
+    saved history. Return the path to save history to on exit, or None if
+    there's no readline.
+    """
+    try:
+        import readline
+    except ImportError:
+        return None
+    path = os.path.expanduser(REPL_HISTORY_FILE)
+    try:
+        readline.read_history_file(path)
+    except IOError:
+        # Probably just doesn't exist yet.
+        pass
+    readline.set_history_length(REPL_HISTORY_LENGTH)
+    return path
+
+def saveReplHistory(path):
+    import readline
+    try:
+        readline.write_history_file(path)
+    except IOError as e:
+        print("Warning: couldn't save history to {!r}: {}".format(path, e))
+
+
+REPL_HELP = """\
+Enter one or more values to show them, or one of these commands:
+  :float, :double, :long-double, :half
+                  switch format (also :binary32, :binary64, :intel80, :fp16)
+  :value, :bits   treat input as a value or as a bit pattern
+  :exact, :approx print exact or approximate decimal
+  :max-digits [N] with :exact, stop after N significant digits (no N: no limit)
+  :next [N]       step up N representable values (default 1) from the last one
+  :prev [N]       step down N representable values (default 1)
+  :timing         turn per-query latency reporting on or off
+  :mode           show the current settings
+  :help           show this help
+  :quit           exit (also :exit, or Ctrl-D)"""
+
+class ReplSession(object):
+    """
+    State for --repl: the settings that the command-line options would
+    otherwise control (kept in args, so convertInput etc. work unchanged), plus
+    the most recently shown value for :next and :prev. When interactive, the
+    prompt separates one query's output from the next and timing starts out
+    on; otherwise, outputs are separated by blank lines as in the
+    non-interactive mode, and timing starts out off.
+    """
+    def __init__(self, args, interactive=False):
+        self.args        = args
+        self.context     = mkContext(args.format)
+        self.current     = None
+        self.interactive = interactive
+        self.timing      = interactive
+        self.shownAny    = False
+        self.formats = {
+            "float":       BINARY32,
+            "binary32":    BINARY32,
+            "double":      BINARY64,
+            "binary64":    BINARY64,
+            "long-double": INTEL80,
+            "intel80":     INTEL80,
+            "half":        HALF_PREC,
+            "fp16":        HALF_PREC,
+        }
+
+    def handleLine(self, line):
+        """Handle one line of input. Return False if it's time to exit."""
+        line = line.strip()
+        if not line:
+            return True
+        if line.startswith(":"):
+            return self.runCommand(line[1:].split())
+
+        start = time.time()
+        for inp in line.split():
+            try:
+                fltVal, inputType = convertInput(inp, self.args, self.context)
+            except InputError as e:
+                print("Error: {}".format(e))
+                continue
+            self.show("### INPUT {}: {}".format(inputType, inp), fltVal)
+        self.reportLatency(start)
+        return True
+
+    def runCommand(self, words):
+        if not words:
+            print("Error: missing command after ':' (try :help)")
+            return True
+        cmd, params = words[0].lower(), words[1:]
+
+        if cmd in ["quit", "exit"]:
+            return False
+        elif cmd == "help":
+            print(REPL_HELP)
+        elif cmd in self.formats:
+            self.args.format = self.formats[cmd]
+            self.context = mkContext(self.args.format)
+            # Stepping from a value in some other format would be confusing.
+            self.current = None
+            self.printMode()
+        elif cmd in ["value", "bits"]:
+            self.args.input_is_bits = (cmd == "bits")
+            self.printMode()
+        elif cmd in ["exact", "approx"]:
+            self.args.exact = (cmd == "exact")
+            self.printMode()
+        elif cmd == "max-digits":
+            count = self.parseCount(cmd, params, default=None)
+            if count is not False:
+                self.args.max_digits = count
+                self.printMode()
+        elif cmd in ["next", "prev"]:
+            self.step(cmd, params)
+        elif cmd == "timing":
+            self.timing = not self.timing
+            print("Timing {}".format("on" if self.timing else "off"))
+        elif cmd == "mode":
+            self.printMode()
+        else:
+            print("Error: unknown command ':{}' (try :help)".format(cmd))
+        return True
+
+    def parseCount(self, cmd, params, default):
+        """
+        Parse the optional positive integer argument to a command. Return
+        default if there isn't one, or False (after printing an error) if it's
+        no good.
+        """
+        if not params:
+            return default
+        try:
+            if len(params) != 1:
+                raise ValueError
+            count = int(params[0], 0)
+            if count < 1:
+                raise ValueError
+        except ValueError:
+            print("Error: :{} takes one positive integer, got {!r}".format(
+                cmd, " ".join(params)))
+            return False
+        return count
+
+    def step(self, cmd, params):
+        count = self.parseCount(cmd, params, default=1)
+        if count is False:
+            return
+        if self.current is None:
+            print("Error: nothing to step from; enter a value first")
+            return
+        start = time.time()
+        if cmd == "next":
+            fltVal = self.current.nextUp(count)
+            header = "### NEXT UP"
+        else:
+            fltVal = self.current.nextDown(count)
+            header = "### NEXT DOWN"
+        if count != 1:
+            header += " x{:d}".format(count)
+        self.show(header, fltVal)
+        self.reportLatency(start)
+
+    def show(self, header, fltVal):
+        if self.shownAny and not self.interactive:
+            print("")
+        self.shownAny = True
+        print(header)
+        showFloat(fltVal, exactDecimal=self.args.exact,
+            maxDigits=self.args.max_digits)
+        self.current = fltVal
+
+    def reportLatency(self, start):
+        if self.timing:
+            print("({:.2f} ms)".format((time.time() - start) * 1000))
+
+    def printMode(self):
+        mode = "Mode: {}, {} input, {} decimal".format(self.args.format,
+            "bits" if self.args.input_is_bits else "value",
+            "exact" if self.args.exact else "approx")
+        if self.args.exact and self.args.max_digits is not None:
+            mode += " (max {:d} digits)".format(self.args.max_digits)
+        print(mode)
+
+
+def parseInput(inp, args, context):
+    """
+    Parse one input string (as a value or as bits, depending on args) into a
+    FloatValue. Return (fltVal, inputType). On failure, print an error and
+    exit.
+    """
+    try:
+        return convertInput(inp, args, context)
+    except InputError as e:
+        print("Error: {}".format(e))
+        sys.exit(1)
+
+
+class InputError(ValueError):
+    """An input string that can't be converted. The message is user-facing."""
+    pass
+
+
+def convertInput(inp, args, context):
+    """
+    Like parseInput, but raise InputError on failure instead of exiting.
+    """
+    inputType = "???"
+    if args.input_is_bits:
+        try:
+            bits = int(inp, 0)
+            if bits < 0:
+                raise ValueError
+        except ValueError:
+            # Either < 0 or failed to parse
+            # Could try something like the following, but then we might
+            # want to also check for "-", and "e" and "p" (for
+            # exponents), and really at that point we should just be
+            # checking if it parses as a float. Which wouldn't be that
+            # bad, but seems overkill.
+            #if "." in inp:
+            #    printf("Did you mean to specify --value?")
+            raise InputError("illegal bits {!r}, must be nonnegative "
+                    "integer".format(inp))
+        # Warn if the bits input looks like decimal. Don't warn if it
+        # looks like a single-digit constant (which would be the same
+        # in hex anyway, minus prefix) or an octal constant (which is
+        # honestly kind of an odd choice as well, but I guess it's
+        # power-of-2 based at least).
+        if inp.isdigit() and not inp.startswith("0") and bits >= 10:
+            print("Warning: bits {!r} appear to be decimal; recommend "
+                    "hex instead.")
+        if bits >= (1 << args.format.totalBits):
+            raise InputError("bits {inp!r} too large, {gotWidth} bits "
+                    "long but {fmt} format only has {maxWidth} bits"
+                    .format(
+                        inp      = inp,
+                        # Length of binary repr minus "0b"
+                        gotWidth = len(bin(bits)) - 2,
+                        fmt      = args.format,
+                        maxWidth = args.format.totalBits))
+        fltVal = FloatValue.fromBits(bits, args.format)
+        inputType = "BITS"
+    else:
+        try:
+            value, inputType = parseValue(inp, context)
+            fltVal = FloatValue.fromValue(value, args.format)
+        except ValueError:
+            raise InputError("failed to parse value {!r}".format(inp))
+        # TODO:
+        #   - Error if the parse succeeded but it's out of range
+        #   - Warn if hex input and it's not exact
+        #       - ...actually maybe note this in decimal as well? Could
+        #         be a "note" in decimal and a "warning" in hex.
+    return fltVal, inputType
+
+
+def parseValue(inp, context):
+    """
+    Parse a decimal or hex float string, rounding it according to context.
+    Return (value, inputType). Raise ValueError if it doesn't parse.
+    """
+    # Note: it's ("0x" in inp) not (inp.startswith("0x")) because there could
+    # be a negative sign in front. Nothing with a "0x" in it can be valid
+    # decimal, and fromhex is already going to check validity, so it doesn't
+    # matter that we're being overly forgiving with this check.
+    with BIGFLOAT_LOCK:
+        if "0x" in inp or "0X" in inp:
+            return bigfloat.BigFloat.fromhex(inp, context=context), "HEX"
+        value = bigfloat.BigFloat(inp, context=context)
+        # bigfloat doesn't preserve the sign bit of "-nan", even though it is
+        # able to represent a NaN with the sign bit set.
+        if bigfloat.is_nan(value) and NEG_NAN_RE.match(inp):
+            value = bigfloat.copysign(value, -1, context=context)
+        return value, "DECIMAL"
+
+def parseValueToOdd(inp, precision):
+    """
+    Parse a decimal or hex float string at the given precision (with
+    effectively unlimited exponent range), using round-to-odd. Return (value,
+    exact, inputType), where exact says whether value is exactly the input.
+
+    Round-to-odd is what makes one wide result reusable: if value has at least
+    2 more bits of precision than some format, then rounding value into that
+    format gives the same result as rounding the original input directly. With
+    ordinary round-to-nearest, the second rounding could go the wrong way.
+    """
+    # MPFR doesn't provide round-to-odd, so build it: round toward and away
+    # from zero at one bit less precision. If they agree, the parse was exact.
+    # Otherwise they're adjacent, and their midpoint is exactly the truncated
+    # value with a 1 appended, which is the round-to-odd result.
+    narrowContext = mkWideContext(precision - 1)
+    towardZero, inputType = parseValue(inp,
+        narrowContext + bigfloat.RoundTowardZero)
+    if not bigfloat.is_finite(towardZero):
+        return towardZero, True, inputType
+    awayFromZero, _ = parseValue(inp,
+        narrowContext + bigfloat.RoundAwayFromZero)
+    if towardZero == awayFromZero:
+        return towardZero, True, inputType
+
+    exactContext = mkWideContext(precision)
+    with BIGFLOAT_LOCK:
+        midpoint = bigfloat.div(
+            bigfloat.add(towardZero, awayFromZero, context=exactContext), 2,
+            context=exactContext)
+    return midpoint, False, inputType
 
 NEG_NAN_RE = re.compile("\s*-\s*nan", flags=re.IGNORECASE)
 
@@ -208,6 +643,34 @@ def parseArgs():
     parser.add_argument("--approx", action="store_false", dest="exact",
                         help="print approximate decimal representation " +
                             "(sufficient to recover value)")
+    parser.add_argument("--max-digits", type=int, default=None, metavar="N",
+                        help="with --exact, stop after N significant digits")
+    parser.add_argument("--worst", type=int, default=None, metavar="N",
+                        help="with --diff-files, show the N worst " +
+                            "mismatches (default {:d})".format(DEFAULT_WORST))
+    parser.add_argument("--jobs", type=int, default=None, metavar="N",
+                        help="with --scan, read files using N processes " +
+                            "(default: one per CPU)")
+
+    # Modes other than the default "show each value". At most one at a time.
+    modes = parser.add_mutually_exclusive_group()
+    modes.add_argument("--ulp-diff", action="store_true",
+                       help="given two values A and B, show the signed " +
+                           "distance from A to B in ULPs")
+    modes.add_argument("--all-formats", action="store_true",
+                       help="show each value rounded to every supported " +
+                           "format, side by side")
+    modes.add_argument("--diff-files", action="store_true",
+                       help="given two files GOLDEN and CANDIDATE of raw " +
+                           "little-endian floats, compare them element by " +
+                           "element in ULPs")
+    modes.add_argument("--scan", action="store_true",
+                       help="treat inputs as files or directories, and " +
+                           "list float literals in them that are inexact " +
+                           "in the selected format")
+    modes.add_argument("--repl", action="store_true",
+                       help="read values and commands interactively " +
+                           "(type :help for the commands)")
 
     # Now sort out positional from non-positional arguments ourself, because
     # the rules are too bizarre for argparse to handle on its own. Positional
@@ -227,10 +690,20 @@ def parseArgs():
     # argparse. An alternative way to do this would be to override
     # parser._negative_number_matcher, but since that's not documented, I'm
     # hesitant to take that approach.
+    #
+    # Options that take a separate value (like "--worst 3") need to bring that
+    # value along with them, including when they're abbreviated (like
+    # "--wor 3"), which argparse allows. The "--worst=3" form is handled by the
+    # usual rule for long-form options.
     nonpos_args = []
     pos_args = []
+    expecting_value = False
     for i in range(1, len(sys.argv)):
         arg = sys.argv[i]
+        if expecting_value:
+            nonpos_args.append(arg)
+            expecting_value = False
+            continue
         # If there's already a "--", stop parsing here because everything else
         # must be positional. Skip over the "--" since we're already going to
         # add that ourself.
@@ -260,28 +733,102 @@ def parseArgs():
             pos_args.append(arg)
         else:
             nonpos_args.append(arg)
+            expecting_value = takesSeparateValue(arg)
 
     args = parser.parse_args(nonpos_args + ["--"] + pos_args)
 
-    if not args.inputs:
+    if not args.inputs and not args.repl:
         print("Must specify at least one value")
         parser.print_usage()
         sys.exit(1)
 
+    if args.max_digits is not None and args.max_digits < 1:
+        print("--max-digits must be at least 1")
+        parser.print_usage()
+        sys.exit(1)
+
+    if args.max_digits is not None and not args.exact:
+        print("--max-digits only applies with --exact")
+        parser.print_usage()
+        sys.exit(1)
+
+    if args.jobs is not None and args.jobs < 1:
+        print("--jobs must be at least 1")
+        parser.print_usage()
+        sys.exit(1)
+
+    if args.repl and args.inputs:
+        print("--repl doesn't take any values on the command line")
+        parser.print_usage()
+        sys.exit(1)
+
+    if args.input_is_bits and (args.all_formats or args.diff_files or
+            args.scan):
+        print("--bits can't be combined with --all-formats, --diff-files, "
+              "or --scan")
+        parser.print_usage()
+        sys.exit(1)
+
+    if args.worst is not None and not args.diff_files:
+        print("--worst only applies with --diff-files")
+        parser.print_usage()
+        sys.exit(1)
+    if args.worst is None:
+        args.worst = DEFAULT_WORST
+
+    if args.jobs is not None and not args.scan:
+        print("--jobs only applies with --scan")
+        parser.print_usage()
+        sys.exit(1)
+
+    if args.ulp_diff and len(args.inputs) != 2:
+        print("--ulp-diff requires exactly two values")
+        parser.print_usage()
+        sys.exit(1)
+
+    if args.diff_files and len(args.inputs) != 2:
+        print("--diff-files requires exactly two files")
+        parser.print_usage()
+        sys.exit(1)
+
     return args
 
 
+# Default for --worst.
+DEFAULT_WORST = 5
+
+# Options which take a value as a separate argument. parseArgs needs to know
+# about these so it doesn't mistake the value for a positional argument.
+OPTIONS_WITH_VALUES = ["--max-digits", "--worst", "--jobs"]
+
+def takesSeparateValue(arg):
+    """
+    Whether the option arg (as given on the command line) is one of
+    OPTIONS_WITH_VALUES, possibly abbreviated. An abbreviation that's also a
+    prefix of some other option is ambiguous, and argparse will reject it
+    regardless of how we split things up.
+    """
+    if arg in OPTIONS_WITH_VALUES:
+        return True
+    if not arg.startswith("--") or len(arg) <= 2 or "=" in arg:
+        return False
+    return any(opt.startswith(arg) for opt in OPTIONS_WITH_VALUES)
+
+
 def selfTest():
-    assert mkContext(BINARY32)  == bigfloat.single_precision
-    assert mkContext(BINARY64)  == bigfloat.double_precision
-    assert mkContext(HALF_PREC) == bigfloat.half_precision
+    assert mkContext(BINARY32)  == \
+        bigfloat.single_precision + bigfloat.RoundTiesToEven
+    assert mkContext(BINARY64)  == \
+        bigfloat.double_precision + bigfloat.RoundTiesToEven
+    assert mkContext(HALF_PREC) == \
+        bigfloat.half_precision + bigfloat.RoundTiesToEven
 
 
 
 ###############################################################################
 # Formatting floats (and various properties of them)
 
-def showFloat(fltVal, exactDecimal=False):
+def showFloat(fltVal, exactDecimal=False, maxDigits=None):
     """
     Example format:
 
@@ -310,66 +857,107 @@ def showFloat(fltVal, exactDecimal=False):
     #         bit of the mantissa, and by that definition powers of 2 are 1/2
     #         ulp from their nextDown.
 
-    with mkContext(fltVal.format):
-        decStr = formatDecimal(fltVal, exactDecimal)
-        if exactDecimal:
-            print("Dec (exact):  {}".format(decStr))
-        else:
-            print("Dec (approx): {}".format(decStr))
+    if exactDecimal:
+        # The exact representation can run to thousands of digits, so
+        # write it out as it's generated rather than building it up first.
+        sys.stdout.write("Dec (exact):  ")
+        for chunk in exactDecimalChunks(fltVal, maxDigits):
+            sys.stdout.write(chunk)
+        print("")
+    else:
+        print("Dec (approx): {}".format(formatDecimal(fltVal, False)))
 
-        print(    "Hex (%a):     {}".format(formatHex(fltVal)))
+    print(    "Hex (%a):     {}".format(formatHex(fltVal)))
 
-        if bigfloat.is_finite(fltVal.value):
-            print("int10 * ULP:  {sgn}{mant:d} * 2**{expo:d}" \
-                .format(sgn  = "-" if fltVal.signbit else "",
-                        mant = fltVal.reprIntMant,
-                        expo = fltVal.log2Ulp))
+    if bigfloat.is_finite(fltVal.value):
+        print("int10 * ULP:  {sgn}{mant:d} * 2**{expo:d}" \
+            .format(sgn  = "-" if fltVal.signbit else "",
+                    mant = fltVal.reprIntMant,
+                    expo = fltVal.log2Ulp))
 
-        print(    "fpclassify:   {}".format(getFpClassifyStr(fltVal)))
+    print(    "fpclassify:   {}".format(getFpClassifyStr(fltVal)))
 
-        if fltVal.otherBitsPossible:
-            print("Example bits")
-            print("       (hex): {}".format(formatBitsAsHex(fltVal)))
-            print("       (bin): {}".format(formatBitsAsBin(fltVal)))
-        else:
-            print("Bits (hex):   {}".format(formatBitsAsHex(fltVal)))
-            print("Bits (bin):   {}".format(formatBitsAsBin(fltVal)))
+    if fltVal.otherBitsPossible:
+        print("Example bits")
+        print("       (hex): {}".format(formatBitsAsHex(fltVal)))
+        print("       (bin): {}".format(formatBitsAsBin(fltVal)))
+    else:
+        print("Bits (hex):   {}".format(formatBitsAsHex(fltVal)))
+        print("Bits (bin):   {}".format(formatBitsAsBin(fltVal)))
 
-def formatDecimal(fltVal, exact):
+def showAllFormats(wide, exact, exactDecimal=False, maxDigits=None):
+    """
+    Print a table comparing a parsed value rounded to each format in
+    ALL_FORMATS. wide and exact are as returned by parseValueToOdd. Example
+    format (some columns trimmed):
+
+    Format    Dec (approx)         Hex (%a)       ULP     ...  Round err
+    __fp16    0.099976             0x1.998p-4     2**-14  ...  -0.4
+    binary32  0.100000001          0x1.99999ap-4  2**-27  ...  +0.2
+    ...
+    """
+    rows = [("Format",
+             "Dec (exact)" if exactDecimal else "Dec (approx)",
+             "Hex (%a)",
+             "ULP",
+             "fpclassify",
+             "Bits (hex)",
+             "Round err")]
+    for fltFormat in ALL_FORMATS:
+        if bigfloat.is_nan(wide):
+            # Don't rely on rounding to preserve the sign of a NaN.
+            rounded = wide
+        else:
+            rounded = roundToFormat(wide, fltFormat)
+        fltVal = FloatValue.fromValue(rounded, fltFormat)
+        ulp = ""
+        if bigfloat.is_finite(fltVal.value):
+            ulp = "2**{:d}".format(fltVal.log2Ulp)
+        rows.append((str(fltFormat),
+                     formatDecimal(fltVal, exactDecimal, maxDigits),
+                     formatHex(fltVal),
+                     ulp,
+                     getFpClassifyStr(fltVal),
+                     formatBitsAsHex(fltVal),
+                     formatRoundingError(fltVal, wide, exact)))
+
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    for row in rows:
+        print("  ".join(cell.ljust(width)
+                        for cell, width in zip(row, widths)).rstrip())
+
+def formatRoundingError(fltVal, wide, exact):
+    """
+    Format (fltVal - wide) in ulps of fltVal, where wide is the higher
+    precision value fltVal was rounded from.
+    """
+    if bigfloat.is_nan(wide):
+        return "n/a"
+    if not bigfloat.is_finite(fltVal.value):
+        if bigfloat.is_inf(wide):
+            return "0"
+        return "overflow"
+
+    errContext = mkWideContext(ALL_FORMATS_PRECISION)
+    with BIGFLOAT_LOCK:
+        err = bigfloat.div(bigfloat.sub(fltVal.value, wide, context=errContext),
+            bigfloat.exp2(fltVal.log2Ulp, context=errContext),
+            context=errContext)
+        if bigfloat.is_zero(err):
+            assert exact
+            return "0"
+        # Note that if the parse wasn't exact, wide is only accurate to within
+        # one of its own ulps. Since ALL_FORMATS_PRECISION leaves plenty of
+        # extra bits even for the widest format, that doesn't matter at 3
+        # digits.
+        return "{:+.3g}".format(err)
+
+def formatDecimal(fltVal, exact, maxDigits=None):
     if not bigfloat.is_finite(fltVal.value):
         return formatInfNan(fltVal)
 
     if exact:
-        # I think a longest exact base-10 representation for a floating-point
-        # format is:
-        #     nextDown(2*FLT_MIN)
-        #   = 2*FLT_MIN - MIN_FLT_SUBNORM
-        #   = (2**(1 + trailingMantBits) - 1) * 2**log2OfMinSubnorm
-        # whose decimal digits are the same as:
-        #     (2**(1 + trailingMantBits) - 1) * 5**-log2OfMinSubnorm
-        # In case I'm wrong, format it with twice that many digits and then
-        # assert that the number of sig figs is within my bound.
-        mostDigits = len(str((2**(1 + fltVal.format.trailingMantBits) - 1) *
-            5**-fltVal.format.log2OfMinSubnorm))
-
-        # Use %g mostly because it omits extra trailing zeros after the decimal
-        # point, and that's what I want. (Since I'm using such a large
-        # precision, simple values would look completely nuts otherwise.) The
-        # heuristic %g uses for fixed vs. exponential notation is reasonable;
-        # I might prefer exponential for large-magnitude values over a few tens
-        # of digits (say 1e+100), but I don't care enough to implement
-        # something myself.
-        exactString = "{val:.{prec}g}".format(val=fltVal.value,
-            prec=2*mostDigits)
-
-        # Check bound
-        sigFigs = exactString.partition("e")[0]
-        numSigFigs = len(sigFigs)
-        if "." in sigFigs:
-            numSigFigs -= 1
-        assert numSigFigs <= mostDigits
-
-        return exactString
+        return "".join(exactDecimalChunks(fltVal, maxDigits))
     else:
         # The C standard says that this is the number of base-10 digits
         # required to serialize all floating-point values of a given precision
@@ -378,7 +966,142 @@ def formatDecimal(fltVal, exact):
         # committee.
         prec = int(math.ceil(1 +
             (1 + fltVal.format.trailingMantBits)*math.log(2, 10)))
-        return "{val:.{prec}g}".format(val=fltVal.value, prec=prec)
+        # Formatting goes through MPFR too, so it needs the lock as well.
+        with BIGFLOAT_LOCK:
+            return "{val:.{prec}g}".format(val=fltVal.value, prec=prec)
+
+# Number of digits exactDecimalChunks generates at a time.
+EXACT_DECIMAL_CHUNK_DIGITS = 1000
+
+def exactDecimalChunks(fltVal, maxDigits=None):
+    """
+    Generate the exact decimal representation of fltVal a piece at a time, so
+    the whole string never needs to be in memory at once. Joined together, the
+    pieces are what "%g" would print with unlimited precision: exponential
+    notation only for very small values, and no trailing zeros after the
+    decimal point.
+
+    If maxDigits is given, stop after that many significant digits. If that
+    cuts off any nonzero digits, they're replaced with "...". Exponential vs.
+    fixed notation is then chosen the way "%.{maxDigits}g" would, so that when
+    the digits are cut off before the decimal point, the exponent still shows
+    where it goes.
+    """
+    if not bigfloat.is_finite(fltVal.value):
+        yield formatInfNan(fltVal)
+        return
+
+    if fltVal.signbit:
+        yield "-"
+    if fltVal.reprIntMant == 0:
+        yield "0"
+        return
+
+    # Use plain integer arithmetic, with value = num / den. Scale so that
+    # 1 <= num / den < 10; then each decimal digit is just the integer part of
+    # the remainder times 10.
+    if fltVal.log2Ulp >= 0:
+        num, den = fltVal.reprIntMant << fltVal.log2Ulp, 1
+    else:
+        num, den = fltVal.reprIntMant, 1 << -fltVal.log2Ulp
+    expo = decimalExponent(num, den)
+    if expo >= 0:
+        den *= 10**expo
+    else:
+        num *= 10**-expo
+
+    # Same rule as %g, where precision is effectively infinite if unlimited.
+    expNotation = expo < -4 or (maxDigits is not None and expo >= maxDigits)
+
+    # Layout state: how many more integer digits are expected before the
+    # decimal point (fixed notation only), and whether the decimal point has
+    # been written yet.
+    intDigitsLeft = 1 if expNotation else max(expo + 1, 0)
+    pointWritten = False
+    if not expNotation and expo < 0:
+        yield "0." + "0" * (-expo - 1)
+        pointWritten = True
+
+    digit, rem = divmod(num, den)
+    pending = str(digit)
+    numDigits = 1
+    while True:
+        # Write out the pending digits, with the decimal point if they cross
+        # it.
+        if intDigitsLeft > 0:
+            intPart = pending[:intDigitsLeft]
+            yield intPart
+            intDigitsLeft -= len(intPart)
+            pending = pending[len(intPart):]
+        if pending:
+            if not pointWritten:
+                yield "."
+                pointWritten = True
+            yield pending
+
+        if rem == 0 or numDigits == maxDigits:
+            break
+
+        # Generate the next chunk of digits.
+        count = EXACT_DECIMAL_CHUNK_DIGITS
+        if maxDigits is not None:
+            count = min(count, maxDigits - numDigits)
+        chunk, rem = divmod(rem * 10**count, den)
+        pending = "{:0{}d}".format(chunk, count)
+        if rem == 0:
+            pending = pending.rstrip("0")
+        numDigits += len(pending)
+
+    # An integer in fixed notation might have trailing zeros left over. (Only
+    # if we weren't truncated, since then the integer digits all fit.)
+    if intDigitsLeft > 0:
+        yield "0" * intDigitsLeft
+
+    if rem != 0:
+        yield "..."
+    else:
+        assert numDigits <= maxExactDigits(fltVal.format)
+
+    if expNotation:
+        yield "e{:+03d}".format(expo)
+
+def maxExactDigits(fltFormat):
+    """
+    Upper bound on the number of significant digits in the exact decimal
+    representation of a value in fltFormat.
+    """
+    # I think a longest exact base-10 representation for a floating-point
+    # format is:
+    #     nextDown(2*FLT_MIN)
+    #   = 2*FLT_MIN - MIN_FLT_SUBNORM
+    #   = (2**(1 + trailingMantBits) - 1) * 2**log2OfMinSubnorm
+    # whose decimal digits are the same as:
+    #     (2**(1 + trailingMantBits) - 1) * 5**-log2OfMinSubnorm
+    # In case I'm wrong, exactDecimalChunks asserts that it stays within this
+    # bound.
+    return 1 + decimalExponent((2**(1 + fltFormat.trailingMantBits) - 1) *
+        5**-fltFormat.log2OfMinSubnorm, 1)
+
+def decimalExponent(num, den):
+    """
+    Return floor(log10(num / den)) for positive integers num and den, computed
+    exactly.
+    """
+    # Estimate from the bit lengths, which can be off by one either way, then
+    # correct it.
+    expo = int(math.floor((num.bit_length() - den.bit_length()) *
+        math.log10(2)))
+    while not atLeastPow10(num, den, expo):
+        expo -= 1
+    while atLeastPow10(num, den, expo + 1):
+        expo += 1
+    return expo
+
+def atLeastPow10(num, den, expo):
+    """Return whether num / den >= 10**expo."""
+    if expo >= 0:
+        return num >= den * 10**expo
+    return num * 10**-expo >= den
 
 def formatHex(fltVal):
     """
@@ -514,14 +1237,9 @@ def getFpClassifyStr(fltVal):
 
 
 def formatBitsAsHex(fltVal):
-    allBits = fltVal.signbit
-    allBits <<= fltVal.format.expBits
-    allBits |= fltVal.storedExpo
-    allBits <<= fltVal.format.storedMantBits
-    allBits |= fltVal.storedMant
     numDigs = ceildiv(1 + fltVal.format.expBits + fltVal.format.storedMantBits,
         4)
-    return "0x{val:0{count}x}".format(val=allBits, count=numDigs)
+    return "0x{val:0{count}x}".format(val=fltVal.bits, count=numDigs)
 
 def formatBitsAsBin(fltVal):
     return "{sgn:01b} {expo:0{expoLen}b} {mant:0{mantLen}b}" \
@@ -548,13 +1266,14 @@ class FloatValue(object):
         super(FloatValue, self).__init__(**kwargs)
 
         if bigfloat.is_finite(self.value):
-            assert self.sign * self.reprIntMant * \
-                bigfloat.exp2(self.log2Ulp) == self.value
+            assert intTimesPow2(self.sign, self.reprIntMant, self.log2Ulp,
+                mkContext(self.format)) == self.value
         # TODO other self-tests?
 
     @classmethod
     def fromValue(cls, value, fltFormat, **kwargs):
-        sign, expo, mant = valToSEM(value, fltFormat)
+        with BIGFLOAT_LOCK:
+            sign, expo, mant = valToSEM(value, fltFormat)
         if bigfloat.is_nan(value):
             kwargs["otherBitsPossible"] = True
         return cls(fltFormat, value, sign, expo, mant, **kwargs)
@@ -568,7 +1287,8 @@ class FloatValue(object):
         sign = bits
         assert sign == 0 or sign == 1
 
-        value = bitsToVal(sign, expo, mant, fltFormat)
+        with BIGFLOAT_LOCK:
+            value = bitsToVal(sign, expo, mant, fltFormat)
         return cls(fltFormat, value, sign, expo, mant, **kwargs)
 
     @property
@@ -629,9 +1349,109 @@ class FloatValue(object):
                 assert ret == 1
         return ret
 
+    @property
+    def bits(self):
+        allBits = self.signbit
+        allBits <<= self.format.expBits
+        allBits |= self.storedExpo
+        allBits <<= self.format.storedMantBits
+        allBits |= self.storedMant
+        return allBits
+
+    @property
+    def magnitudeOrdinal(self):
+        """
+        Number of steps between adjacent representable values from zero to
+        abs(self). Infinity is one step past FLT_MAX, and NaNs are further out
+        still, ordered by payload.
+
+        This is the exponent and trailing mantissa bits concatenated together,
+        which is the usual trick for comparing floats as integers. An explicit
+        leading bit is dropped so that Intel80 steps from max subnormal to
+        FLT_MIN in one ulp like everyone else. (That also puts pseudo-denormals
+        on the same ordinal as the normal value they're equal to, and places
+        unnormals as if the leading bit were set.)
+        """
+        trailingMant = self.storedMant & \
+            ((1 << self.format.trailingMantBits) - 1)
+        return (self.storedExpo << self.format.trailingMantBits) | trailingMant
+
+    @property
+    def ulpOrdinal(self):
+        """
+        Signed position of this value on the number line, counted in ulps
+        (where an "ulp" here is the gap between adjacent representable values,
+        not the place value used by log2Ulp). +0 and -0 are both 0, so the
+        number of ulps between two values of the same format is just the
+        difference of their ordinals. Not meaningful for NaN.
+        """
+        if self.signbit:
+            return -self.magnitudeOrdinal
+        return self.magnitudeOrdinal
+
+    @property
+    def totalOrderKey(self):
+        """
+        Nonnegative integer key which sorts the same way as IEEE 754
+        totalOrder:
+            -nan < -inf < ... < -0 < +0 < ... < +inf < +nan
+        (with NaNs further ordered by payload). Unlike ulpOrdinal, -0 and +0
+        get different keys.
+        """
+        magBits = self.format.expBits + self.format.trailingMantBits
+        if self.signbit:
+            return (1 << magBits) - 1 - self.magnitudeOrdinal
+        return (1 << magBits) + self.magnitudeOrdinal
+
+    @classmethod
+    def fromUlpOrdinal(cls, ordinal, fltFormat, signbit=0, **kwargs):
+        """
+        Inverse of ulpOrdinal. Since +0 and -0 share ordinal 0, signbit picks
+        between them; it's ignored for any other ordinal. Ordinals past
+        infinity (that is, NaNs) aren't allowed.
+        """
+        infOrdinal = ((1 << fltFormat.expBits) - 1) << \
+            fltFormat.trailingMantBits
+        assert -infOrdinal <= ordinal <= infOrdinal
+        if ordinal != 0:
+            signbit = int(ordinal < 0)
+        magnitude = -ordinal if ordinal < 0 else ordinal
+        expo = magnitude >> fltFormat.trailingMantBits
+        mant = magnitude & ((1 << fltFormat.trailingMantBits) - 1)
+        if fltFormat.explicitLeadingBit and expo != 0:
+            mant |= 1 << fltFormat.trailingMantBits
+        bits = (((signbit << fltFormat.expBits) | expo) <<
+            fltFormat.storedMantBits) | mant
+        return cls.fromBits(bits, fltFormat, **kwargs)
+
+    def nextUp(self, count=1):
+        """
+        The representable value count steps above this one (or below, if count
+        is negative), found by stepping through the bit patterns. Like IEEE
+        nextUp: stops at infinity, steps from either zero to the smallest
+        subnormal, and leaves NaN unchanged.
+        """
+        if bigfloat.is_nan(self.value):
+            return self
+        infOrdinal = ((1 << self.format.expBits) - 1) << \
+            self.format.trailingMantBits
+        ordinal = self.ulpOrdinal + count
+        ordinal = max(-infOrdinal, min(infOrdinal, ordinal))
+        # Landing on zero keeps our own sign: stepping up to zero from below
+        # gives -0, and stepping down to it from above gives +0.
+        return FloatValue.fromUlpOrdinal(ordinal, self.format,
+            signbit=self.signbit)
+
+    def nextDown(self, count=1):
+        return self.nextUp(-count)
+
+# Note: valToSEM and bitsToVal do bigfloat arithmetic without taking
+# BIGFLOAT_LOCK themselves; FloatValue.fromValue and fromBits take it.
+
 def valToSEM(value, fltFormat):
-    signBit = 1 if bigfloat.copysign(1, value) < 0 else 0
-    value = bigfloat.abs(value)
+    context = mkContext(fltFormat)
+    signBit = 1 if bigfloat.is_negative(value) else 0
+    value = bigfloat.abs(value, context=context)
 
     if not bigfloat.is_finite(value):
         expo = fltFormat.storedExpInfNan
@@ -659,9 +1479,9 @@ def valToSEM(value, fltFormat):
     #     log2(0x0.fffffep-126) = -0x1.f800000b8aa3cp+6
     # To avoid rounding up in that case, set the rounding mode toward negative
     # infinity.
-    with bigfloat.RoundTowardNegative:
-        expo = bigfloat.floor(bigfloat.log2(value))
-    biasedExpo = int(expo + fltFormat.bias)
+    expo = int(bigfloat.floor(bigfloat.log2(value,
+        context=context + bigfloat.RoundTowardNegative), context=context))
+    biasedExpo = expo + fltFormat.bias
     if biasedExpo < 1:
         # Subnormal. The value stored is one less than for FLT_MIN, but the
         # represented exponent is the same; the values are continuous because
@@ -670,9 +1490,11 @@ def valToSEM(value, fltFormat):
         expo = 1 - fltFormat.bias
 
     # The mantissa as it's stored (an integer value).
-    with bigfloat.Context(emax=bigfloat.getcontext().emax +
-            fltFormat.trailingMantBits):
-        mant = value * bigfloat.pow(2, fltFormat.trailingMantBits - expo)
+    mantContext = context + bigfloat.Context(emax=context.emax +
+        fltFormat.trailingMantBits)
+    mant = bigfloat.mul(value,
+        bigfloat.exp2(fltFormat.trailingMantBits - expo, context=mantContext),
+        context=mantContext)
     assert mant == int(mant)
     mant = int(mant)
     leadingMantBitPlaceValue = 2**fltFormat.trailingMantBits
@@ -689,6 +1511,7 @@ def valToSEM(value, fltFormat):
     return (signBit, biasedExpo, mant)
 
 def bitsToVal(signBit, storedExpo, storedMant, fltFormat):
+    context = mkContext(fltFormat)
     sign = (-1) ** signBit
 
     if storedExpo == fltFormat.storedExpInfNan:
@@ -700,9 +1523,10 @@ def bitsToVal(signBit, storedExpo, storedMant, fltFormat):
         if fltFormat.explicitLeadingBit:
             trailingMant &= ((1 << fltFormat.trailingMantBits) - 1)
         if trailingMant == 0:
-            return bigfloat.copysign(bigfloat.BigFloat("inf"), sign)
+            special = bigfloat.BigFloat("inf", context=context)
         else:
-            return bigfloat.copysign(bigfloat.BigFloat("nan"), sign)
+            special = bigfloat.BigFloat("nan", context=context)
+        return bigfloat.copysign(special, sign, context=context)
 
     intMant = storedMant
     if not fltFormat.explicitLeadingBit and storedExpo != 0:
@@ -714,7 +1538,402 @@ def bitsToVal(signBit, storedExpo, storedMant, fltFormat):
         log2Ulp += 1
         assert log2Ulp == fltFormat.log2OfMinSubnorm
 
-    return sign * bigfloat.BigFloat(intMant) * bigfloat.exp2(log2Ulp)
+    return intTimesPow2(sign, intMant, log2Ulp, context)
+
+def intTimesPow2(sign, intMant, log2, context):
+    """
+    Compute sign * intMant * 2**log2 in the given context, where sign is +1 or
+    -1. (The sign is separate so that zero can come out as -0.)
+    """
+    with BIGFLOAT_LOCK:
+        value = bigfloat.mul(intMant, bigfloat.exp2(log2, context=context),
+            context=context)
+        if sign < 0:
+            value = bigfloat.neg(value, context=context)
+        return value
+
+###############################################################################
+# Total order and ULP distance, vectorized over arrays of bit patterns
+#
+# These are the same computations as FloatValue.totalOrderKey and
+# FloatValue.ulpOrdinal, but done with integer ops directly on the bits (no
+# bigfloat arithmetic) so they can be applied to large arrays at once. They
+# require numpy.
+
+def bitsDtype(fltFormat):
+    """
+    Smallest unsigned numpy dtype that holds a bit pattern of fltFormat, or
+    the object dtype (Python ints) if there isn't one, e.g. for Intel80.
+    """
+    for width in (16, 32, 64):
+        if fltFormat.totalBits <= width:
+            return numpy.dtype("uint{}".format(width))
+    return numpy.dtype(object)
+
+def bitsArray(bits, fltFormat):
+    if numpy is None:
+        raise ImportError("numpy is required for vectorized operations")
+    return numpy.asarray(bits, dtype=bitsDtype(fltFormat))
+
+def splitBitsArray(bits, fltFormat):
+    """
+    Split an array of bit patterns into (signbits, magnitudeOrdinals), in the
+    same dtype as the bits. See FloatValue.magnitudeOrdinal.
+    """
+    bits = bitsArray(bits, fltFormat)
+    # Convert constants to the array's dtype up front. Otherwise older numpy
+    # promotes uint64 combined with a Python int to float64, which can't be
+    # shifted.
+    const = bits.dtype.type
+    signbits = bits >> const(fltFormat.totalBits - 1)
+    expo = (bits >> const(fltFormat.storedMantBits)) & \
+        const((1 << fltFormat.expBits) - 1)
+    trailingMant = bits & const((1 << fltFormat.trailingMantBits) - 1)
+    mags = (expo << const(fltFormat.trailingMantBits)) | trailingMant
+    return signbits, mags
+
+def infMagnitude(mags, fltFormat):
+    """
+    The magnitude ordinal of infinity, in the dtype of mags (as returned by
+    splitBitsArray). Larger magnitudes are NaNs.
+    """
+    return mags.dtype.type(
+        fltFormat.storedExpInfNan << fltFormat.trailingMantBits)
+
+def isNanBits(bits, fltFormat):
+    """
+    Boolean array, True where the bit pattern is a NaN. Ignores the explicit
+    leading bit, same as bitsToVal.
+    """
+    _, mags = splitBitsArray(bits, fltFormat)
+    return mags > infMagnitude(mags, fltFormat)
+
+def isInfBits(bits, fltFormat):
+    """
+    Boolean array, True where the bit pattern is an infinity. Ignores the
+    explicit leading bit, same as bitsToVal.
+    """
+    _, mags = splitBitsArray(bits, fltFormat)
+    return mags == infMagnitude(mags, fltFormat)
+
+def totalOrderKeys(bits, fltFormat):
+    """
+    Vectorized FloatValue.totalOrderKey: map an array of bit patterns to
+    unsigned keys in the same dtype, such that sorting the keys (e.g. with
+    numpy.argsort, or a radix sort) sorts the values in IEEE totalOrder.
+    """
+    signbits, mags = splitBitsArray(bits, fltFormat)
+    const = mags.dtype.type
+    magBits = fltFormat.expBits + fltFormat.trailingMantBits
+    return numpy.where(signbits != 0,
+                       const((1 << magBits) - 1) - mags,
+                       const(1 << magBits) + mags).astype(mags.dtype)
+
+def ulpOrdinals(bits, fltFormat):
+    """
+    Vectorized FloatValue.ulpOrdinal. The result is int64 if the format is
+    narrower than 64 bits, so that differences of ordinals can't overflow;
+    otherwise it's an object array of Python ints.
+    """
+    signbits, mags = splitBitsArray(bits, fltFormat)
+    if fltFormat.totalBits < 64:
+        mags = mags.astype(numpy.int64)
+    else:
+        mags = mags.astype(object)
+    return numpy.where(signbits != 0, -mags, mags).astype(mags.dtype)
+
+def ulpDistances(bitsA, bitsB, fltFormat):
+    """
+    Signed number of ulps from each element of bitsA to the corresponding
+    element of bitsB (positive if B is greater). +0 and -0 are 0 ulps apart.
+    Elements where either side is a NaN give meaningless results; mask them
+    out with isNanBits.
+    """
+    return ulpOrdinals(bitsB, fltFormat) - ulpOrdinals(bitsA, fltFormat)
+
+def absUlpDistances(bitsA, bitsB, fltFormat):
+    """
+    Same as abs(ulpDistances(bitsA, bitsB, fltFormat)), but computed in the
+    unsigned dtype of the bits. This can't overflow (the largest distance is
+    between -nan and +nan, which is two magnitudes that each have one bit less
+    than the format), so 64-bit formats don't need to fall back to Python
+    ints.
+    """
+    signbitsA, magsA = splitBitsArray(bitsA, fltFormat)
+    signbitsB, magsB = splitBitsArray(bitsB, fltFormat)
+    return absMagnitudeDistances(signbitsA, magsA, signbitsB, magsB)
+
+def absMagnitudeDistances(signbitsA, magsA, signbitsB, magsB):
+    """
+    absUlpDistances, for bits that have already been through splitBitsArray.
+    """
+    return numpy.where(signbitsA == signbitsB,
+                       numpy.where(magsA > magsB, magsA - magsB, magsB - magsA),
+                       magsA + magsB).astype(magsA.dtype)
+
+
+
+###############################################################################
+# Comparing raw dumps of floats
+
+# Number of elements to process at a time when comparing files, for formats
+# whose bit patterns fit in a fixed-width numpy dtype, and for those that need
+# Python ints (Intel80). Every temporary in a chunk is a full-size array, and
+# for Intel80 each element is a separate int object, so the chunks are kept
+# small. Comparing two 32 MB Intel80 dumps takes about 3 s and 100 MB peak
+# RSS, and two 80 MB binary32 dumps about 0.8 s and 200 MB, both of which are
+# mostly the interpreter and the mapped file pages. Larger chunks only add
+# memory, without being any faster.
+DIFF_CHUNK_ELEMS = 1 << 16
+DIFF_CHUNK_ELEMS_OBJECT = 1 << 12
+
+def diffChunkElems(fltFormat):
+    if bitsDtype(fltFormat) == numpy.dtype(object):
+        return DIFF_CHUNK_ELEMS_OBJECT
+    return DIFF_CHUNK_ELEMS
+
+def bitsFileElemBytes(fltFormat):
+    """
+    Bytes per element in a raw dump of fltFormat values: the bit width rounded
+    up to a power of 2. So Intel80 is read the way x86-64 stores long double,
+    as 16 bytes of which the top 6 are padding.
+    """
+    elemBytes = 1
+    while elemBytes * 8 < fltFormat.totalBits:
+        elemBytes *= 2
+    return elemBytes
+
+def mapBitsFile(path, fltFormat):
+    """
+    Memory-map a raw dump of little-endian fltFormat values, read-only. Pass
+    the result to readMappedBits to get at the bit patterns.
+    """
+    elemBytes = bitsFileElemBytes(fltFormat)
+    size = os.path.getsize(path)
+    if size % elemBytes != 0:
+        raise ValueError("size of {!r} ({:d} bytes) is not a multiple of the "
+            "{:d}-byte {} element size".format(path, size, elemBytes,
+                fltFormat))
+    # Formats wider than 64 bits are read as pairs of 64-bit words, low word
+    # first.
+    words = max(1, elemBytes // 8)
+    dtype = numpy.dtype("<u{:d}".format(elemBytes // words))
+    shape = (size // elemBytes, words)
+    if size == 0:
+        # mmap doesn't allow empty files.
+        return numpy.zeros(shape, dtype=dtype)
+    return numpy.memmap(path, dtype=dtype, mode="r", shape=shape)
+
+def readMappedBits(mapped, start, stop, fltFormat):
+    """
+    Copy elements [start, stop) out of an array from mapBitsFile, as an array
+    of bit patterns suitable for the vectorized functions above.
+    """
+    rows = mapped[start:stop]
+    if rows.shape[1] == 1:
+        return bitsArray(rows[:, 0], fltFormat)
+    bits = rows[:, 0].astype(object)
+    highMask = (1 << (fltFormat.totalBits - 64)) - 1
+    bits |= (rows[:, 1].astype(object) & highMask) << 64
+    return bitsArray(bits, fltFormat)
+
+class FileDiff(object):
+    """
+    Summary of an element-by-element comparison of two files of floats. See
+    diffBitsFiles.
+    """
+    def __init__(self, **kwargs):
+        self.numElems         = 0
+        self.numExact         = 0
+        self.numNanMismatches = 0
+        self.numInfMismatches = 0
+        # Number of elements where both sides are finite. The ULP statistics
+        # only cover these.
+        self.numCompared      = 0
+        self.sumUlps          = 0.0
+        self.maxUlps          = 0
+        self.maxIndex         = None
+        # List of (ulps, index, goldenBits, candidateBits), worst first. NaN
+        # and inf mismatches have ulps None, and rank above any finite error.
+        self.worst            = []
+        super(FileDiff, self).__init__(**kwargs)
+
+def diffBitsFiles(goldenPath, candidatePath, fltFormat, numWorst=5,
+        chunkElems=None):
+    """
+    Compare two raw dumps of fltFormat values (see mapBitsFile), chunkElems
+    elements at a time (by default, diffChunkElems), and return a FileDiff.
+    The worst list holds the first numWorst NaN or inf mismatches, followed by
+    the largest nonzero ULP errors to make numWorst entries in total, lowest
+    index first among ties.
+    """
+    golden = mapBitsFile(goldenPath, fltFormat)
+    candidate = mapBitsFile(candidatePath, fltFormat)
+    if len(golden) != len(candidate):
+        raise ValueError("{!r} has {:d} elements but {!r} has {:d}".format(
+            goldenPath, len(golden), candidatePath, len(candidate)))
+
+    if chunkElems is None:
+        chunkElems = diffChunkElems(fltFormat)
+
+    diff = FileDiff()
+    diff.numElems = len(golden)
+    for start in range(0, diff.numElems, chunkElems):
+        stop = min(start + chunkElems, diff.numElems)
+        a = readMappedBits(golden, start, stop, fltFormat)
+        b = readMappedBits(candidate, start, stop, fltFormat)
+
+        # Split each side once, and work out everything else from that.
+        signbitsA, magsA = splitBitsArray(a, fltFormat)
+        signbitsB, magsB = splitBitsArray(b, fltFormat)
+        infMag = infMagnitude(magsA, fltFormat)
+        nanA = magsA > infMag
+        nanB = magsB > infMag
+        infA = magsA == infMag
+        infB = magsB == infMag
+        differ = a != b
+        nanMismatch = nanA != nanB
+        infMismatch = (infA | infB) & ~(nanA | nanB) & differ
+        diff.numExact += int(numpy.count_nonzero(~differ))
+        diff.numNanMismatches += int(numpy.count_nonzero(nanMismatch))
+        diff.numInfMismatches += int(numpy.count_nonzero(infMismatch))
+
+        # Non-finite mismatches have no meaningful ULP error, but they're
+        # worse than any finite error, so they go at the front of the worst
+        # list. Only the first numWorst of them can make the cut.
+        if numWorst > 0:
+            mismatches = numpy.nonzero(nanMismatch | infMismatch)[0]
+            diff.worst.extend((None, start + int(i), int(a[i]), int(b[i]))
+                              for i in mismatches[:numWorst])
+            diff.worst.sort(key=worstSortKey)
+            del diff.worst[numWorst:]
+
+        finite = ~(nanA | nanB | infA | infB)
+        ulps = absMagnitudeDistances(signbitsA, magsA, signbitsB, magsB)
+        ulps = numpy.where(finite, ulps, 0).astype(ulps.dtype)
+        numFinite = int(numpy.count_nonzero(finite))
+        if numFinite == 0:
+            continue
+        diff.numCompared += numFinite
+        diff.sumUlps += float(ulps.astype(numpy.float64).sum())
+        chunkMax = int(ulps.max())
+        if diff.maxIndex is None or chunkMax > diff.maxUlps:
+            diff.maxUlps = chunkMax
+            diff.maxIndex = start + int(numpy.nonzero(finite &
+                (ulps == chunkMax))[0][0])
+
+        # Candidates for the worst list: everything strictly greater than the
+        # numWorst'th largest error, plus the lowest-index ties with it.
+        nonzero = numpy.nonzero(ulps)[0]
+        if numWorst <= 0 or len(nonzero) == 0:
+            continue
+        if len(nonzero) > numWorst:
+            kth = numpy.partition(ulps[nonzero], -numWorst)[-numWorst]
+            greater = nonzero[ulps[nonzero] > kth]
+            ties = nonzero[ulps[nonzero] == kth][:numWorst - len(greater)]
+            nonzero = numpy.concatenate([greater, ties])
+        diff.worst.extend((int(ulps[i]), start + int(i), int(a[i]), int(b[i]))
+                          for i in nonzero)
+        diff.worst.sort(key=worstSortKey)
+        del diff.worst[numWorst:]
+
+    return diff
+
+def worstSortKey(entry):
+    """
+    Sort key for FileDiff.worst entries: non-finite mismatches (ulps None)
+    first, then largest ULP error first, then lowest index.
+    """
+    ulps, index = entry[:2]
+    if ulps is None:
+        return (0, 0, index)
+    return (1, -ulps, index)
+
+
+
+###############################################################################
+# Scanning source files for float literals
+
+# A C-style float literal: decimal with a radix point and/or exponent, or hex
+# with a binary exponent, optionally with a type suffix. Plain integers are
+# skipped, since nearly all of them are exact and they'd drown out everything
+# else. The sign isn't included because it doesn't affect exactness. The
+# lookarounds keep us from matching pieces of identifiers and of things like
+# version numbers and IP addresses ("1.2.3.4").
+FLOAT_LITERAL_RE = re.compile(r"""
+    (?<![\w.])
+    (
+        0[xX] (?: [0-9a-fA-F]+ \.? [0-9a-fA-F]* | \. [0-9a-fA-F]+ )
+            [pP] [+-]? [0-9]+
+      | (?: [0-9]+ \. [0-9]* | \. [0-9]+ ) (?: [eE] [+-]? [0-9]+ )?
+      | [0-9]+ [eE] [+-]? [0-9]+
+    )
+    [fFlL]?
+    (?![\w.])
+    """, re.VERBOSE)
+
+def findScanFiles(paths):
+    """
+    Expand a list of files and directories into a list of files, walking
+    directories recursively (in sorted order, so the output is stable). Hidden
+    directories (.git and the like) are skipped, unless named explicitly.
+    """
+    files = []
+    for path in paths:
+        if not os.path.isdir(path):
+            files.append(path)
+            continue
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames[:] = sorted(name for name in dirnames
+                                 if not name.startswith("."))
+            files.extend(os.path.join(dirpath, name)
+                         for name in sorted(filenames))
+    return files
+
+def scanFile(path):
+    """
+    Return (path, [(lineno, literal), ...], error) for the float literals in
+    one file. error is None, or a message if the file couldn't be read. Reading
+    errors are returned rather than raised so that one bad file doesn't kill a
+    whole pool of workers.
+    """
+    literals = []
+    try:
+        with io.open(path, encoding="utf-8", errors="replace") as f:
+            for lineno, line in enumerate(f, 1):
+                literals.extend((lineno, match.group(1))
+                                for match in FLOAT_LITERAL_RE.finditer(line))
+    except (IOError, OSError) as e:
+        return path, [], str(e)
+    return path, literals, None
+
+def scanFiles(paths, jobs=None):
+    """
+    Apply scanFile to each of paths, using a pool of jobs processes (default:
+    one per CPU). Results are in the same order as paths.
+    """
+    if jobs == 1 or len(paths) <= 1:
+        return [scanFile(path) for path in paths]
+    pool = multiprocessing.Pool(jobs)
+    try:
+        return pool.map(scanFile, paths, chunksize=16)
+    finally:
+        pool.close()
+        pool.join()
+
+def checkLiteral(literal, fltFormat):
+    """
+    If literal is exactly representable in fltFormat, return None. Otherwise
+    return (fltVal, err), where fltVal is the value it rounds to and err is
+    the rounding error as formatted by formatRoundingError.
+    """
+    wide, exact, _ = parseValueToOdd(literal, ALL_FORMATS_PRECISION)
+    fltVal = FloatValue.fromValue(roundToFormat(wide, fltFormat), fltFormat)
+    if exact and fltVal.value == wide:
+        return None
+    return fltVal, formatRoundingError(fltVal, wide, exact)
+
+
 
 ###############################################################################
 # Float formats - basics
@@ -799,14 +2018,70 @@ def mkContext(fltFormat):
     # subnormals: emin is the value such that 0.5 * 2 ** emin is the smallest
     # subnormal.
     emin = fltFormat.log2OfMinSubnorm + 1
+    # Specify every attribute, including rounding, so that nothing depends on
+    # whatever context happens to be current in the calling thread.
     return bigfloat.Context(precision=precision, emin=emin, emax=emax,
-        subnormalize=True)
+        subnormalize=True, rounding=bigfloat.ROUND_TIES_TO_EVEN)
+
+def mkWideContext(precision):
+    """
+    Complete context with the given precision and the widest exponent range
+    bigfloat supports, for intermediate values that don't belong to any
+    particular format.
+    """
+    return bigfloat.Context(precision=precision, emin=bigfloat.EMIN_MIN,
+        emax=bigfloat.EMAX_MAX, subnormalize=False,
+        rounding=bigfloat.ROUND_TIES_TO_EVEN)
+
+def roundToFormat(value, fltFormat):
+    """Round value to fltFormat, returning a BigFloat."""
+    with BIGFLOAT_LOCK:
+        return bigfloat.pos(value, context=mkContext(fltFormat))
 
 BINARY32  = FloatFormat("binary32",  8, 23, False)
 BINARY64  = FloatFormat("binary64", 11, 52, False)
 INTEL80   = FloatFormat("Intel80",  15, 64, True)
 HALF_PREC = FloatFormat("__fp16",    5, 10, False)
 
+# Every supported format, narrowest first, for --all-formats.
+ALL_FORMATS = [HALF_PREC, BINARY32, BINARY64, INTEL80]
+
+# Precision at which --all-formats parses its inputs. It needs at least 2 more
+# bits than the widest format (see parseValueToOdd); the rest let us report the
+# rounding error into the widest format accurately.
+ALL_FORMATS_PRECISION = max(fmt.totalMantBits for fmt in ALL_FORMATS) + 64
+
+###############################################################################
+# Thread safety
+#
+# Everything here can be called from multiple threads at once. bigfloat keeps
+# its current context per thread, and we never rely on it: every bigfloat call
+# gets a complete context (see mkContext and mkWideContext), so results don't
+# depend on what the calling thread has set up. The one piece of state bigfloat
+# doesn't keep per thread is MPFR's exponent range, which it sets around every
+# operation (and MPFR's own string conversions save and restore it too).
+# That's thread-local if MPFR was built with thread-local storage (the
+# default, where the compiler supports it). If not, bigfloat calls, including
+# formatting a BigFloat as a string, are serialized behind BIGFLOAT_LOCK.
+
+class NullLock(object):
+    """Stand-in for a lock, for when no locking is needed."""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excInfo):
+        return False
+
+def mpfrIsThreadSafe():
+    try:
+        return bool(bigfloat.core.mpfr.mpfr_buildopt_tls_p())
+    except AttributeError:
+        # Can't tell, so assume the worst.
+        return False
+
+# Reentrant, since some of the functions that take it call each other.
+BIGFLOAT_LOCK = NullLock() if mpfrIsThreadSafe() else threading.RLock()
+
 ###############################################################################
 # Util / misc
 
@@ -43,14 +43,17 @@ testno=0
 failures=0
 skipped=0
 
-# Used for test cases that are compared against the C implementation
+# Used for test cases that are compared against the C implementation. The
+# expected output comes from stdin; to give showfloat something on its own
+# stdin, name a file in stdin_file (e.g. "stdin_file=in.txt do1 ...").
 do1() {
     ((testno++))
     cat > cor.txt
     if ((use_c_impl)); then
-        "$my_dir"/compare/showfloat "$@" &> got.txt
+        "$my_dir"/compare/showfloat "$@" < "${stdin_file:-/dev/null}" &> got.txt
     else
-        python "$my_dir"/../showfloat.py "$@" &> got.txt
+        python "$my_dir"/../showfloat.py "$@" < "${stdin_file:-/dev/null}" \
+            &> got.txt
     fi
     if ! diff -u cor.txt got.txt > diff.txt; then
         if ((failures > 0)); then
@@ -671,6 +674,476 @@ Error: bits '0x10000000000000000' too large, 65 bits long but binary64 format on
 END
 
 
+
+###############################################################################
+# --ulp-diff
+
+do1nc --ulp-diff -0x1p-149 0x1p-149 <<END
+### INPUT HEX: -0x1p-149
+Dec (approx): -1.40129846e-45
+Hex (%a):     -0x0.000002p-126
+int10 * ULP:  -1 * 2**-149
+fpclassify:   FP_SUBNORMAL
+Bits (hex):   0x80000001
+Bits (bin):   1 00000000 00000000000000000000001
+
+### INPUT HEX: 0x1p-149
+Dec (approx): 1.40129846e-45
+Hex (%a):     0x0.000002p-126
+int10 * ULP:  1 * 2**-149
+fpclassify:   FP_SUBNORMAL
+Bits (hex):   0x00000001
+Bits (bin):   0 00000000 00000000000000000000001
+
+### ULP DIFF: -0x1p-149 -> 0x1p-149
+ULPs (B - A): 2
+END
+
+# Infinity is one ulp past the max finite value
+do1nc --double --ulp-diff 0x1.fffffffffffffp+1023 inf <<END
+### INPUT HEX: 0x1.fffffffffffffp+1023
+Dec (approx): 1.7976931348623157e+308
+Hex (%a):     0x1.fffffffffffffp+1023
+int10 * ULP:  9007199254740991 * 2**971
+fpclassify:   FP_NORMAL
+Bits (hex):   0x7fefffffffffffff
+Bits (bin):   0 11111111110 1111111111111111111111111111111111111111111111111111
+
+### INPUT DECIMAL: inf
+Dec (approx): inf
+Hex (%a):     inf
+fpclassify:   FP_INFINITE
+Bits (hex):   0x7ff0000000000000
+Bits (bin):   0 11111111111 0000000000000000000000000000000000000000000000000000
+
+### ULP DIFF: 0x1.fffffffffffffp+1023 -> inf
+ULPs (B - A): 1
+END
+
+do1nc --ulp-diff 1.5 nan <<END
+### INPUT DECIMAL: 1.5
+Dec (approx): 1.5
+Hex (%a):     0x1.8p+0
+int10 * ULP:  12582912 * 2**-23
+fpclassify:   FP_NORMAL
+Bits (hex):   0x3fc00000
+Bits (bin):   0 01111111 10000000000000000000000
+
+### INPUT DECIMAL: nan
+Dec (approx): nan
+Hex (%a):     nan
+fpclassify:   FP_NAN
+Example bits
+       (hex): 0x7fc00000
+       (bin): 0 11111111 10000000000000000000000
+
+### ULP DIFF: 1.5 -> nan
+ULPs (B - A): n/a (NaN)
+END
+
+# The explicit leading bit shouldn't make crossing from FLT_MIN down into the
+# subnormals look like a big jump.
+do1nc --intel80 --bits --ulp-diff 0x00018000000000000000 0x00007fffffffffffffff <<END
+### INPUT BITS: 0x00018000000000000000
+Dec (approx): 3.36210314311209350626e-4932
+Hex (%a):     0x1p-16382
+int10 * ULP:  9223372036854775808 * 2**-16445
+fpclassify:   FP_NORMAL
+Bits (hex):   0x00018000000000000000
+Bits (bin):   0 000000000000001 1000000000000000000000000000000000000000000000000000000000000000
+
+### INPUT BITS: 0x00007fffffffffffffff
+Dec (approx): 3.3621031431120935059e-4932
+Hex (%a):     0x0.fffffffffffffffep-16382
+int10 * ULP:  9223372036854775807 * 2**-16445
+fpclassify:   FP_SUBNORMAL
+Bits (hex):   0x00007fffffffffffffff
+Bits (bin):   0 000000000000000 0111111111111111111111111111111111111111111111111111111111111111
+
+### ULP DIFF: 0x00018000000000000000 -> 0x00007fffffffffffffff
+ULPs (B - A): -1
+END
+
+do1nc --ulp-diff 1.5 <<END
+--ulp-diff requires exactly two values
+usage: showfloat.py [-h] [-f] [-d] [-L] [-H] [-v] [-b] [--exact] [--approx]
+                    [--max-digits N] [--worst N] [--jobs N]
+                    [--ulp-diff | --all-formats | --diff-files | --scan | --repl]
+                    [VALUE ...]
+END
+
+do1nc --ulp-diff --diff-files 1 2 <<END
+usage: showfloat.py [-h] [-f] [-d] [-L] [-H] [-v] [-b] [--exact] [--approx]
+                    [--max-digits N] [--worst N] [--jobs N]
+                    [--ulp-diff | --all-formats | --diff-files | --scan | --repl]
+                    [VALUE ...]
+showfloat.py: error: argument --diff-files: not allowed with argument --ulp-diff
+END
+
+do1nc --worst 3 1 2 <<END
+--worst only applies with --diff-files
+usage: showfloat.py [-h] [-f] [-d] [-L] [-H] [-v] [-b] [--exact] [--approx]
+                    [--max-digits N] [--worst N] [--jobs N]
+                    [--ulp-diff | --all-formats | --diff-files | --scan | --repl]
+                    [VALUE ...]
+END
+
+
+
+###############################################################################
+# --all-formats
+
+do1nc --all-formats 0.1 1e40 <<END
+### INPUT DECIMAL: 0.1
+Format    Dec (approx)             Hex (%a)                 ULP     fpclassify  Bits (hex)              Round err
+__fp16    0.099976                 0x1.998p-4               2**-14  FP_NORMAL   0x2e66                  -0.4
+binary32  0.100000001              0x1.99999ap-4            2**-27  FP_NORMAL   0x3dcccccd              +0.2
+binary64  0.10000000000000001      0x1.999999999999ap-4     2**-56  FP_NORMAL   0x3fb999999999999a      +0.4
+Intel80   0.100000000000000000001  0x1.999999999999999ap-4  2**-67  FP_NORMAL   0x3ffbcccccccccccccccd  +0.2
+
+### INPUT DECIMAL: 1e40
+Format    Dec (approx)                Hex (%a)                   ULP    fpclassify   Bits (hex)              Round err
+__fp16    inf                         inf                               FP_INFINITE  0x7c00                  overflow
+binary32  inf                         inf                               FP_INFINITE  0x7f800000              overflow
+binary64  1e+40                       0x1.d6329f1c35ca5p+132     2**80  FP_NORMAL    0x483d6329f1c35ca5      +0.251
+Intel80   9.99999999999999999978e+39  0x1.d6329f1c35ca4bfap+132  2**69  FP_NORMAL    0x4083eb194f8e1ae525fd  -0.366
+END
+
+do1nc --all-formats --bits 0x3f800000 <<END
+--bits can't be combined with --all-formats, --diff-files, or --scan
+usage: showfloat.py [-h] [-f] [-d] [-L] [-H] [-v] [-b] [--exact] [--approx]
+                    [--max-digits N] [--worst N] [--jobs N]
+                    [--ulp-diff | --all-formats | --diff-files | --scan | --repl]
+                    [VALUE ...]
+END
+
+do1nc --all-formats --ulp-diff 1 2 <<END
+usage: showfloat.py [-h] [-f] [-d] [-L] [-H] [-v] [-b] [--exact] [--approx]
+                    [--max-digits N] [--worst N] [--jobs N]
+                    [--ulp-diff | --all-formats | --diff-files | --scan | --repl]
+                    [VALUE ...]
+showfloat.py: error: argument --ulp-diff: not allowed with argument --all-formats
+END
+
+
+
+###############################################################################
+# --diff-files
+
+# Elements: 1.5 vs. nextUp(1.5), 2.5 vs. NaN, +0 vs. -0
+printf '\x00\x00\xc0\x3f\x00\x00\x20\x40\x00\x00\x00\x00' > golden.bin
+printf '\x01\x00\xc0\x3f\x00\x00\xc0\x7f\x00\x00\x00\x80' > candidate.bin
+printf 'abc' > truncated.bin
+# Elements: inf vs. FLT_MAX
+printf '\x00\x00\x80\x7f' > inf.bin
+printf '\xff\xff\x7f\x7f' > max.bin
+
+# NaN and inf mismatches rank above any finite error.
+do1nc --diff-files --worst 2 golden.bin candidate.bin <<END
+### DIFF FILES (binary32): golden.bin -> candidate.bin
+Elements:       3
+Exact matches:  0
+NaN mismatches: 1
+Inf mismatches: 0
+Max ULP error:  1 (at index 0)
+Mean ULP error: 0.5
+
+### WORST 1 OF 2, INDEX 1, GOLDEN (NaN mismatch)
+Dec (approx): 2.5
+Hex (%a):     0x1.4p+1
+int10 * ULP:  10485760 * 2**-22
+fpclassify:   FP_NORMAL
+Bits (hex):   0x40200000
+Bits (bin):   0 10000000 01000000000000000000000
+
+### WORST 1 OF 2, INDEX 1, CANDIDATE (NaN mismatch)
+Dec (approx): nan
+Hex (%a):     nan
+fpclassify:   FP_NAN
+Bits (hex):   0x7fc00000
+Bits (bin):   0 11111111 10000000000000000000000
+
+### WORST 2 OF 2, INDEX 0, GOLDEN (1 ULPs)
+Dec (approx): 1.5
+Hex (%a):     0x1.8p+0
+int10 * ULP:  12582912 * 2**-23
+fpclassify:   FP_NORMAL
+Bits (hex):   0x3fc00000
+Bits (bin):   0 01111111 10000000000000000000000
+
+### WORST 2 OF 2, INDEX 0, CANDIDATE (1 ULPs)
+Dec (approx): 1.50000012
+Hex (%a):     0x1.800002p+0
+int10 * ULP:  12582913 * 2**-23
+fpclassify:   FP_NORMAL
+Bits (hex):   0x3fc00001
+Bits (bin):   0 01111111 10000000000000000000001
+END
+
+do1nc --diff-files inf.bin max.bin <<END
+### DIFF FILES (binary32): inf.bin -> max.bin
+Elements:       1
+Exact matches:  0
+NaN mismatches: 0
+Inf mismatches: 1
+
+### WORST 1 OF 1, INDEX 0, GOLDEN (Inf mismatch)
+Dec (approx): inf
+Hex (%a):     inf
+fpclassify:   FP_INFINITE
+Bits (hex):   0x7f800000
+Bits (bin):   0 11111111 00000000000000000000000
+
+### WORST 1 OF 1, INDEX 0, CANDIDATE (Inf mismatch)
+Dec (approx): 3.40282347e+38
+Hex (%a):     0x1.fffffep+127
+int10 * ULP:  16777215 * 2**104
+fpclassify:   FP_NORMAL
+Bits (hex):   0x7f7fffff
+Bits (bin):   0 11111110 11111111111111111111111
+END
+
+do1nc --diff-files golden.bin truncated.bin <<END
+Error: size of 'truncated.bin' (3 bytes) is not a multiple of the 4-byte binary32 element size
+END
+
+do1nc --double --diff-files golden.bin candidate.bin <<END
+Error: size of 'golden.bin' (12 bytes) is not a multiple of the 8-byte binary64 element size
+END
+
+do1nc --diff-files --bits golden.bin candidate.bin <<END
+--bits can't be combined with --all-formats, --diff-files, or --scan
+usage: showfloat.py [-h] [-f] [-d] [-L] [-H] [-v] [-b] [--exact] [--approx]
+                    [--max-digits N] [--worst N] [--jobs N]
+                    [--ulp-diff | --all-formats | --diff-files | --scan | --repl]
+                    [VALUE ...]
+END
+
+rm golden.bin candidate.bin truncated.bin inf.bin max.bin
+
+
+
+###############################################################################
+# --scan
+
+mkdir -p scandir/sub
+printf 'x = 0.5;\ny = 0.1f, z = 1e-50; w = 1.;\nversion 1.2.3 at 10.0.0.1, id x1.5\n' > scandir/a.c
+printf 'a,b\n0.25,0x1.8p3\n3.4e38,0.1\n1e39,-.3e-2L\n0x1.0000001p0\n' > scandir/sub/b.csv
+# Hidden directories aren't searched.
+mkdir -p scandir/.git
+printf 'x = 0.1;\n' > scandir/.git/config
+
+do1nc --scan scandir <<END
+### SCAN (binary32): 2 files, 11 literals (10 unique), 7 inexact
+scandir/a.c:2: 0.1 -> 0.100000001 (0x1.99999ap-4), round err +0.2
+scandir/a.c:2: 1e-50 -> 0 (0x0p+0), round err -7.14e-06
+scandir/sub/b.csv:3: 3.4e38 -> 3.39999995e+38 (0x1.ff933cp+127), round err -0.236
+scandir/sub/b.csv:3: 0.1 -> 0.100000001 (0x1.99999ap-4), round err +0.2
+scandir/sub/b.csv:4: 1e39 -> inf (inf), round err overflow
+scandir/sub/b.csv:4: .3e-2 -> 0.00300000003 (0x1.89374cp-9), round err +0.112
+scandir/sub/b.csv:5: 0x1.0000001p0 -> 1 (0x1p+0), round err -0.0312
+END
+
+do1nc --scan --jobs 1 --double scandir/a.c <<END
+### SCAN (binary64): 1 files, 4 literals (4 unique), 2 inexact
+scandir/a.c:2: 0.1 -> 0.10000000000000001 (0x1.999999999999ap-4), round err +0.4
+scandir/a.c:2: 1e-50 -> 1e-50 (0x1.dee7a4ad4b81fp-167), round err +0.0642
+END
+
+# Files that can't be read don't count.
+do1nc --scan --jobs 1 --double nosuch scandir/a.c <<END
+Warning: can't read 'nosuch': [Errno 2] No such file or directory: 'nosuch'
+### SCAN (binary64): 1 files, 4 literals (4 unique), 2 inexact
+scandir/a.c:2: 0.1 -> 0.10000000000000001 (0x1.999999999999ap-4), round err +0.4
+scandir/a.c:2: 1e-50 -> 1e-50 (0x1.dee7a4ad4b81fp-167), round err +0.0642
+END
+
+do1nc --scan --jobs 0 scandir <<END
+--jobs must be at least 1
+usage: showfloat.py [-h] [-f] [-d] [-L] [-H] [-v] [-b] [--exact] [--approx]
+                    [--max-digits N] [--worst N] [--jobs N]
+                    [--ulp-diff | --all-formats | --diff-files | --scan | --repl]
+                    [VALUE ...]
+END
+
+do1nc --jobs 2 1.5 <<END
+--jobs only applies with --scan
+usage: showfloat.py [-h] [-f] [-d] [-L] [-H] [-v] [-b] [--exact] [--approx]
+                    [--max-digits N] [--worst N] [--jobs N]
+                    [--ulp-diff | --all-formats | --diff-files | --scan | --repl]
+                    [VALUE ...]
+END
+
+do1nc --scan --bits scandir <<END
+--bits can't be combined with --all-formats, --diff-files, or --scan
+usage: showfloat.py [-h] [-f] [-d] [-L] [-H] [-v] [-b] [--exact] [--approx]
+                    [--max-digits N] [--worst N] [--jobs N]
+                    [--ulp-diff | --all-formats | --diff-files | --scan | --repl]
+                    [VALUE ...]
+END
+
+rm -r scandir
+
+
+
+###############################################################################
+# --max-digits
+
+do1nc --exact --max-digits 20 --intel80 --bits 1 <<END
+### INPUT BITS: 1
+Dec (exact):  3.6451995318824746025...e-4951
+Hex (%a):     0x0.0000000000000002p-16382
+int10 * ULP:  1 * 2**-16445
+fpclassify:   FP_SUBNORMAL
+Bits (hex):   0x00000000000000000001
+Bits (bin):   0 000000000000000 0000000000000000000000000000000000000000000000000000000000000001
+END
+
+do1nc --exact --max-digits 10 0x1.fffffep+127 <<END
+### INPUT HEX: 0x1.fffffep+127
+Dec (exact):  3.402823466...e+38
+Hex (%a):     0x1.fffffep+127
+int10 * ULP:  16777215 * 2**104
+fpclassify:   FP_NORMAL
+Bits (hex):   0x7f7fffff
+Bits (bin):   0 11111110 11111111111111111111111
+END
+
+do1nc --exact --max-digits 3 123.456 <<END
+### INPUT DECIMAL: 123.456
+Dec (exact):  123...
+Hex (%a):     0x1.edd2f2p+6
+int10 * ULP:  16181625 * 2**-17
+fpclassify:   FP_NORMAL
+Bits (hex):   0x42f6e979
+Bits (bin):   0 10000101 11101101110100101111001
+END
+
+# Abbreviated options still bring their values along.
+do1nc --exact --max 3 123.456 <<END
+### INPUT DECIMAL: 123.456
+Dec (exact):  123...
+Hex (%a):     0x1.edd2f2p+6
+int10 * ULP:  16181625 * 2**-17
+fpclassify:   FP_NORMAL
+Bits (hex):   0x42f6e979
+Bits (bin):   0 10000101 11101101110100101111001
+END
+
+do1nc --exact --max-digits 5 1.5 <<END
+### INPUT DECIMAL: 1.5
+Dec (exact):  1.5
+Hex (%a):     0x1.8p+0
+int10 * ULP:  12582912 * 2**-23
+fpclassify:   FP_NORMAL
+Bits (hex):   0x3fc00000
+Bits (bin):   0 01111111 10000000000000000000000
+END
+
+do1nc --exact --max-digits 0 1.5 <<END
+--max-digits must be at least 1
+usage: showfloat.py [-h] [-f] [-d] [-L] [-H] [-v] [-b] [--exact] [--approx]
+                    [--max-digits N] [--worst N] [--jobs N]
+                    [--ulp-diff | --all-formats | --diff-files | --scan | --repl]
+                    [VALUE ...]
+END
+
+do1nc --max-digits 5 1.5 <<END
+--max-digits only applies with --exact
+usage: showfloat.py [-h] [-f] [-d] [-L] [-H] [-v] [-b] [--exact] [--approx]
+                    [--max-digits N] [--worst N] [--jobs N]
+                    [--ulp-diff | --all-formats | --diff-files | --scan | --repl]
+                    [VALUE ...]
+END
+
+
+
+###############################################################################
+# --repl
+
+printf '1.5\n:next\n:prev 2\n:double\n:next\n' > repl.txt
+printf ':bits\n0x3ff8000000000000 bogus\n:exact\n:max-digits 4\n' >> repl.txt
+printf ':long-double\n:value\n-0\n:next\n:foo\n:next x\n:quit\n1\n' >> repl.txt
+
+stdin_file=repl.txt do1nc --repl <<END
+### INPUT DECIMAL: 1.5
+Dec (approx): 1.5
+Hex (%a):     0x1.8p+0
+int10 * ULP:  12582912 * 2**-23
+fpclassify:   FP_NORMAL
+Bits (hex):   0x3fc00000
+Bits (bin):   0 01111111 10000000000000000000000
+
+### NEXT UP
+Dec (approx): 1.50000012
+Hex (%a):     0x1.800002p+0
+int10 * ULP:  12582913 * 2**-23
+fpclassify:   FP_NORMAL
+Bits (hex):   0x3fc00001
+Bits (bin):   0 01111111 10000000000000000000001
+
+### NEXT DOWN x2
+Dec (approx): 1.49999988
+Hex (%a):     0x1.7ffffep+0
+int10 * ULP:  12582911 * 2**-23
+fpclassify:   FP_NORMAL
+Bits (hex):   0x3fbfffff
+Bits (bin):   0 01111111 01111111111111111111111
+Mode: binary64, value input, approx decimal
+Error: nothing to step from; enter a value first
+Mode: binary64, bits input, approx decimal
+
+### INPUT BITS: 0x3ff8000000000000
+Dec (approx): 1.5
+Hex (%a):     0x1.8p+0
+int10 * ULP:  6755399441055744 * 2**-52
+fpclassify:   FP_NORMAL
+Bits (hex):   0x3ff8000000000000
+Bits (bin):   0 01111111111 1000000000000000000000000000000000000000000000000000
+Error: illegal bits 'bogus', must be nonnegative integer
+Mode: binary64, bits input, exact decimal
+Mode: binary64, bits input, exact decimal (max 4 digits)
+Mode: Intel80, bits input, exact decimal (max 4 digits)
+Mode: Intel80, value input, exact decimal (max 4 digits)
+
+### INPUT DECIMAL: -0
+Dec (exact):  -0
+Hex (%a):     -0x0p+0
+int10 * ULP:  -0 * 2**-16445
+fpclassify:   FP_ZERO
+Bits (hex):   0x80000000000000000000
+Bits (bin):   1 000000000000000 0000000000000000000000000000000000000000000000000000000000000000
+
+### NEXT UP
+Dec (exact):  3.645...e-4951
+Hex (%a):     0x0.0000000000000002p-16382
+int10 * ULP:  1 * 2**-16445
+fpclassify:   FP_SUBNORMAL
+Bits (hex):   0x00000000000000000001
+Bits (bin):   0 000000000000000 0000000000000000000000000000000000000000000000000000000000000001
+Error: unknown command ':foo' (try :help)
+Error: :next takes one positive integer, got 'x'
+END
+
+stdin_file=repl.txt do1nc --repl 1.5 <<END
+--repl doesn't take any values on the command line
+usage: showfloat.py [-h] [-f] [-d] [-L] [-H] [-v] [-b] [--exact] [--approx]
+                    [--max-digits N] [--worst N] [--jobs N]
+                    [--ulp-diff | --all-formats | --diff-files | --scan | --repl]
+                    [VALUE ...]
+END
+
+do1nc --repl --scan <<END
+usage: showfloat.py [-h] [-f] [-d] [-L] [-H] [-v] [-b] [--exact] [--approx]
+                    [--max-digits N] [--worst N] [--jobs N]
+                    [--ulp-diff | --all-formats | --diff-files | --scan | --repl]
+                    [VALUE ...]
+showfloat.py: error: argument --scan: not allowed with argument --repl
+END
+
+rm repl.txt
+
+
 ###############################################################################
 
 # TODO other categories:
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2023 Greg Kronmiller
+#
+# Concurrency stress test for showfloat.py: convert and format values from
+# many threads at once, each with a deliberately unhelpful bigfloat context,
+# and check that every result matches the one computed serially.
+
+import os
+import random
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+    os.pardir))
+
+import bigfloat
+import showfloat
+
+NUM_THREADS = 16
+NUM_RANDOM_BITS = 200
+
+DECIMAL_INPUTS = ["0", "-0", "1", "-1", "0.1", "-0.1", "1e-50", "1e-310",
+                  "1e-4000", "65504", "65520", "3.4028235e38", "1e308",
+                  "1.7976931348623157e308", "1e4000", "2.5", "3.5",
+                  "0.333333333333333333333333333333", "inf", "-inf", "nan",
+                  "-nan", "0x1.fffffep127", "0x1.0000001p0", "-0x1p-1074"]
+
+def edgeBits(fltFormat):
+    signBit = 1 << (fltFormat.totalBits - 1)
+    allOnes = (1 << fltFormat.totalBits) - 1
+    return [0, signBit, 1, signBit | 1, allOnes, allOnes ^ signBit,
+            signBit - 1]
+
+def makeItems():
+    rng = random.Random(20231018)
+    items = []
+    for fltFormat in showfloat.ALL_FORMATS:
+        bitsList = edgeBits(fltFormat)
+        bitsList += [rng.getrandbits(fltFormat.totalBits)
+                     for _ in range(NUM_RANDOM_BITS)]
+        items += [(fltFormat, "bits", bits) for bits in bitsList]
+        items += [(fltFormat, "value", inp) for inp in DECIMAL_INPUTS]
+    return items
+
+def render(item):
+    """
+    Convert one test item and format it every way showfloat can. Returns a
+    tuple of strings, or the name of the exception raised.
+    """
+    fltFormat, kind, inp = item
+    try:
+        roundErr = None
+        if kind == "bits":
+            fltVal = showfloat.FloatValue.fromBits(inp, fltFormat)
+        else:
+            value, _ = showfloat.parseValue(inp,
+                showfloat.mkContext(fltFormat))
+            fltVal = showfloat.FloatValue.fromValue(value, fltFormat)
+            inexact = showfloat.checkLiteral(inp, fltFormat)
+            if inexact is not None:
+                roundErr = inexact[1]
+        return (fltVal.bits,
+                roundErr,
+                showfloat.formatDecimal(fltVal, False),
+                showfloat.formatDecimal(fltVal, True, 50),
+                showfloat.formatHex(fltVal),
+                showfloat.getFpClassifyStr(fltVal),
+                showfloat.formatBitsAsBin(fltVal))
+    except Exception as e:
+        return type(e).__name__
+
+class CountingLock(object):
+    """Reentrant lock that counts how many times it's been taken."""
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.count = 0
+
+    def __enter__(self):
+        self.lock.acquire()
+        self.count += 1
+        return self
+
+    def __exit__(self, *excInfo):
+        self.lock.release()
+        return False
+
+class ThreadStressTest(unittest.TestCase):
+    def test_matches_serial(self):
+        # Whichever of locked or unlocked the local MPFR build calls for.
+        self.checkMatchesSerial()
+
+    def test_matches_serial_locked(self):
+        # Force the locked path, as used when MPFR isn't built with
+        # thread-local storage.
+        lock = CountingLock()
+        savedLock = showfloat.BIGFLOAT_LOCK
+        showfloat.BIGFLOAT_LOCK = lock
+        try:
+            self.checkMatchesSerial()
+        finally:
+            showfloat.BIGFLOAT_LOCK = savedLock
+        self.assertGreater(lock.count, 0)
+
+    def checkMatchesSerial(self):
+        items = makeItems()
+        expected = [render(item) for item in items]
+
+        results = [None] * NUM_THREADS
+        errors = []
+        start = threading.Event()
+
+        def worker(threadIdx):
+            try:
+                # Each thread gets its own ambient context, and none of them
+                # are anything showfloat would use, so any call that picks up
+                # the ambient context will give a wrong answer.
+                bigfloat.setcontext(bigfloat.precision(2 + threadIdx) +
+                    bigfloat.RoundTowardPositive)
+                order = list(range(len(items)))
+                random.Random(threadIdx).shuffle(order)
+                start.wait()
+                got = {}
+                for idx in order:
+                    got[idx] = render(items[idx])
+                results[threadIdx] = got
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker, args=(i,))
+                   for i in range(NUM_THREADS)]
+        for thread in threads:
+            thread.start()
+        start.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        for threadIdx, got in enumerate(results):
+            for idx, item in enumerate(items):
+                self.assertEqual(got[idx], expected[idx],
+                    "thread {:d}, {} input {!r} ({})".format(threadIdx,
+                        item[1], item[2], item[0]))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2023 Greg Kronmiller
+#
+# Tests for showfloat.py's vectorized functions on arrays of bit patterns:
+# check them against the scalar FloatValue properties they're meant to match.
+
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+    os.pardir))
+
+import bigfloat
+import showfloat
+
+NUM_RANDOM_BITS = 200
+
+def edgeBits(fltFormat):
+    """
+    Canonical bit patterns at the interesting points of fltFormat, both signs.
+    """
+    trailing = fltFormat.trailingMantBits
+    leadingBit = (1 << trailing) if fltFormat.explicitLeadingBit else 0
+    def pack(expo, mant):
+        if expo != 0:
+            mant |= leadingBit
+        return (expo << fltFormat.storedMantBits) | mant
+    maxMant = (1 << trailing) - 1
+    infNan = fltFormat.storedExpInfNan
+    positive = [
+        pack(0, 0),                   # zero
+        pack(0, 1),                   # smallest subnormal
+        pack(0, 2),
+        pack(0, maxMant),             # largest subnormal
+        pack(1, 0),                   # smallest normal
+        pack(1, 1),
+        pack(fltFormat.bias, 0),      # one
+        pack(fltFormat.bias, 1),
+        pack(infNan - 1, maxMant),    # largest finite
+        pack(infNan, 0),              # infinity
+        pack(infNan, 1),              # smallest NaN payload
+        pack(infNan, 1 << (trailing - 1)),
+        pack(infNan, maxMant),        # largest NaN payload
+    ]
+    signBit = 1 << (fltFormat.totalBits - 1)
+    return positive + [bits | signBit for bits in positive]
+
+def totalOrderSortKey(fltVal):
+    """
+    Sort key for IEEE totalOrder computed from the value, independently of
+    the ordinals:
+        -nan < -inf < ... < -0 < +0 < ... < +inf < +nan
+    with NaNs ordered by payload (larger payloads further from zero).
+    """
+    if bigfloat.is_nan(fltVal.value):
+        payload = fltVal.storedMant & \
+            ((1 << fltVal.format.trailingMantBits) - 1)
+        if fltVal.signbit:
+            return (0, -payload)
+        return (2, payload)
+    return (1, fltVal.value, not fltVal.signbit)
+
+@unittest.skipIf(showfloat.numpy is None, "numpy not installed")
+class VectorizedTest(unittest.TestCase):
+    def allBits(self, fltFormat):
+        rng = random.Random(20231018)
+        return edgeBits(fltFormat) + [rng.getrandbits(fltFormat.totalBits)
+                                      for _ in range(NUM_RANDOM_BITS)]
+
+    def test_matches_scalar(self):
+        for fltFormat in showfloat.ALL_FORMATS:
+            bitsList = self.allBits(fltFormat)
+            fltVals = [showfloat.FloatValue.fromBits(bits, fltFormat)
+                       for bits in bitsList]
+
+            keys = showfloat.totalOrderKeys(bitsList, fltFormat)
+            self.assertEqual(keys.dtype, showfloat.bitsDtype(fltFormat))
+            self.assertEqual([int(key) for key in keys],
+                             [fltVal.totalOrderKey for fltVal in fltVals],
+                             str(fltFormat))
+
+            ordinals = showfloat.ulpOrdinals(bitsList, fltFormat)
+            if fltFormat.totalBits < 64:
+                self.assertEqual(ordinals.dtype, showfloat.numpy.int64)
+            else:
+                # binary64 and Intel80 fall back to Python ints.
+                self.assertEqual(ordinals.dtype, object)
+            self.assertEqual([int(ordinal) for ordinal in ordinals],
+                             [fltVal.ulpOrdinal for fltVal in fltVals],
+                             str(fltFormat))
+
+    def test_ulp_distances(self):
+        for fltFormat in showfloat.ALL_FORMATS:
+            bitsA = self.allBits(fltFormat)
+            bitsB = list(reversed(bitsA))
+            expected = [
+                showfloat.FloatValue.fromBits(b, fltFormat).ulpOrdinal -
+                showfloat.FloatValue.fromBits(a, fltFormat).ulpOrdinal
+                for a, b in zip(bitsA, bitsB)]
+            got = showfloat.ulpDistances(bitsA, bitsB, fltFormat)
+            self.assertEqual([int(d) for d in got], expected, str(fltFormat))
+            got = showfloat.absUlpDistances(bitsA, bitsB, fltFormat)
+            self.assertEqual([int(d) for d in got],
+                             [abs(d) for d in expected], str(fltFormat))
+
+    def test_argsort_gives_total_order(self):
+        for fltFormat in showfloat.ALL_FORMATS:
+            # Only canonical patterns: Intel80's unnormals and friends don't
+            # have a meaningful place in totalOrder.
+            bitsList = edgeBits(fltFormat)
+            random.Random(1).shuffle(bitsList)
+            keys = showfloat.totalOrderKeys(bitsList, fltFormat)
+            order = showfloat.numpy.argsort(keys, kind="stable")
+            got = [bitsList[i] for i in order]
+            expected = sorted(bitsList, key=lambda bits: totalOrderSortKey(
+                showfloat.FloatValue.fromBits(bits, fltFormat)))
+            self.assertEqual(got, expected, str(fltFormat))
+
+if __name__ == "__main__":
+    unittest.main()